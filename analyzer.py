@@ -4,6 +4,11 @@ Evaluates 8 key financial metrics and generates Buy/Hold/Sell recommendations
 based on the Napkin Math framework.
 """
 
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, NamedTuple
+
+from formatting import fmt_naira
 from models import NapkinMetric, NapkinResult, Recommendation, Signal, StockFinancials
 
 
@@ -14,284 +19,174 @@ def _pct_change(current: float | None, previous: float | None) -> float | None:
     return ((current - previous) / abs(previous)) * 100
 
 
-def _fmt_naira(value: float | None) -> str:
-    """Format a value in Naira (billions/millions)."""
-    if value is None:
-        return "N/A"
-    abs_val = abs(value)
-    if abs_val >= 1_000_000_000_000:
-        return f"{'−' if value < 0 else ''}₦{abs_val / 1_000_000_000_000:.2f}T"
-    if abs_val >= 1_000_000_000:
-        return f"{'−' if value < 0 else ''}₦{abs_val / 1_000_000_000:.2f}B"
-    if abs_val >= 1_000_000:
-        return f"{'−' if value < 0 else ''}₦{abs_val / 1_000_000:.2f}M"
-    return f"{'−' if value < 0 else ''}₦{abs_val:,.2f}"
-
-
-def _evaluate_revenue(fin: StockFinancials) -> NapkinMetric:
-    yoy = _pct_change(fin.revenue, fin.prev_revenue)
-    if yoy is not None and yoy >= 10:
-        signal = Signal.GREEN
-        explanation = f"Revenue grew {yoy:.1f}% YoY — strong growth above 10% threshold"
-    elif yoy is not None and yoy > 0:
-        signal = Signal.YELLOW
-        explanation = f"Revenue grew {yoy:.1f}% YoY — positive but below the 10-15% ideal"
-    elif yoy is not None:
-        signal = Signal.RED
-        explanation = f"Revenue declined {yoy:.1f}% YoY — flat or declining revenue is a red flag"
-    else:
-        signal = Signal.YELLOW
-        explanation = "Insufficient data to calculate YoY revenue change"
+# A rule is (predicate, signal, explanation template). Predicates receive the
+# financials, the metric's current value and its YoY change; the first rule
+# that matches decides the signal. Templates are formatted with ``value``,
+# ``yoy`` and ``naira`` (the value formatted as Naira).
+_Rule = tuple[Callable[[StockFinancials, float | None, float | None], bool], Signal, str]
 
-    return NapkinMetric(
-        name="Revenue",
-        current_value=fin.revenue,
-        previous_value=fin.prev_revenue,
-        yoy_change=yoy,
-        signal=signal,
-        explanation=explanation,
-        format_type="currency",
-    )
 
+class _MetricSpec(NamedTuple):
+    name: str
+    format_type: str
+    # Returns (current_value, previous_value, yoy_change) for the metric card
+    values: Callable[[StockFinancials], tuple[float | None, float | None, float | None]]
+    rules: list[_Rule]
 
-def _evaluate_pat(fin: StockFinancials) -> NapkinMetric:
-    yoy = _pct_change(fin.pat, fin.prev_pat)
-    if fin.pat is not None and fin.pat < 0:
-        signal = Signal.RED
-        explanation = f"Net loss of {_fmt_naira(fin.pat)} — company is not profitable"
-    elif yoy is not None and yoy > 0:
-        signal = Signal.GREEN
-        explanation = f"Profit After Tax grew {yoy:.1f}% YoY — profitability is improving"
-    elif yoy is not None and yoy > -10:
-        signal = Signal.YELLOW
-        explanation = f"PAT changed {yoy:.1f}% YoY — relatively flat"
-    elif yoy is not None:
-        signal = Signal.RED
-        explanation = f"PAT declined {yoy:.1f}% YoY — consistent profit decline is a warning"
-    else:
-        signal = Signal.YELLOW
-        explanation = "Insufficient data to calculate PAT trend"
 
-    return NapkinMetric(
-        name="Profit After Tax",
-        current_value=fin.pat,
-        previous_value=fin.prev_pat,
-        yoy_change=yoy,
-        signal=signal,
-        explanation=explanation,
-        format_type="currency",
-    )
+def _always(fin: StockFinancials, value: float | None, yoy: float | None) -> bool:
+    return True
 
 
-def _evaluate_eps(fin: StockFinancials) -> NapkinMetric:
-    yoy = _pct_change(fin.eps, fin.prev_eps)
-    if fin.eps is not None and fin.eps < 0:
-        signal = Signal.RED
-        explanation = f"Negative EPS (₦{fin.eps:.2f}) — company is losing money per share"
-    elif yoy is not None and yoy > 0:
-        signal = Signal.GREEN
-        explanation = f"EPS increased {yoy:.1f}% YoY — earnings per share growing"
-    elif yoy is not None and yoy > -5:
-        signal = Signal.YELLOW
-        explanation = f"EPS roughly flat ({yoy:.1f}% YoY)"
-    elif yoy is not None:
-        signal = Signal.RED
-        explanation = f"EPS fell {yoy:.1f}% YoY — declining earnings is a red flag"
-    else:
-        signal = Signal.YELLOW
-        explanation = "Insufficient data to evaluate EPS trend"
-
-    return NapkinMetric(
-        name="Earnings Per Share (EPS)",
-        current_value=fin.eps,
-        previous_value=fin.prev_eps,
-        yoy_change=yoy,
-        signal=signal,
-        explanation=explanation,
-        format_type="number",
-    )
+def _yoy_values(current: str, previous: str):
+    """Values callback for metrics judged on their year-over-year change."""
+    def values(fin: StockFinancials) -> tuple[float | None, float | None, float | None]:
+        cur, prev = getattr(fin, current), getattr(fin, previous)
+        return cur, prev, _pct_change(cur, prev)
+    return values
 
 
-def _evaluate_dps(fin: StockFinancials) -> NapkinMetric:
-    if fin.dps is None or fin.dps == 0:
-        if fin.prev_dps is not None and fin.prev_dps > 0:
-            signal = Signal.RED
-            explanation = "Dividend was cut or skipped — previously paid a dividend"
-        else:
-            signal = Signal.YELLOW
-            explanation = "No dividend paid — not necessarily bad for growth stocks"
-        return NapkinMetric(
-            name="Dividend Per Share (DPS)",
-            current_value=fin.dps,
-            previous_value=fin.prev_dps,
-            yoy_change=None,
-            signal=signal,
-            explanation=explanation,
-            format_type="number",
-        )
-
-    yoy = _pct_change(fin.dps, fin.prev_dps)
-    if yoy is not None and yoy > 0:
-        signal = Signal.GREEN
-        explanation = f"DPS increased {yoy:.1f}% YoY — dividend is growing"
-    elif yoy is not None and yoy >= -5:
-        signal = Signal.GREEN
-        explanation = f"DPS stable ({yoy:.1f}% YoY) — consistent dividend"
-    elif yoy is not None:
-        signal = Signal.RED
-        explanation = f"DPS declined {yoy:.1f}% YoY — dividend cut is a warning sign"
-    else:
-        signal = Signal.GREEN
-        explanation = f"Paying dividend of ₦{fin.dps:.2f} per share"
-
-    return NapkinMetric(
-        name="Dividend Per Share (DPS)",
-        current_value=fin.dps,
-        previous_value=fin.prev_dps,
-        yoy_change=yoy,
-        signal=signal,
-        explanation=explanation,
-        format_type="number",
-    )
+def _dps_values(fin: StockFinancials) -> tuple[float | None, float | None, float | None]:
+    # No YoY change is reported when no dividend was paid this year
+    yoy = _pct_change(fin.dps, fin.prev_dps) if fin.dps else None
+    return fin.dps, fin.prev_dps, yoy
 
 
-def _evaluate_payout_ratio(fin: StockFinancials) -> NapkinMetric:
+def _payout_ratio_values(fin: StockFinancials) -> tuple[float | None, float | None, float | None]:
     if fin.eps is None or fin.eps <= 0 or fin.dps is None:
-        return NapkinMetric(
-            name="Payout Ratio",
-            signal=Signal.YELLOW,
-            explanation="Cannot calculate — EPS is zero/negative or no dividend",
-            format_type="percent",
-        )
-
-    ratio = (fin.dps / fin.eps) * 100
-
-    if 30 <= ratio <= 70:
-        signal = Signal.GREEN
-        explanation = f"Payout ratio of {ratio:.0f}% is in the healthy 30-70% range"
-    elif ratio < 30:
-        signal = Signal.YELLOW
-        explanation = f"Payout ratio of {ratio:.0f}% is low — company retains most earnings"
-    elif ratio <= 100:
-        signal = Signal.YELLOW
-        explanation = f"Payout ratio of {ratio:.0f}% is high — approaching sustainability limits"
-    else:
-        signal = Signal.RED
-        explanation = f"Payout ratio of {ratio:.0f}% exceeds 100% — unsustainable, paying more than earned"
-
-    return NapkinMetric(
-        name="Payout Ratio",
-        current_value=ratio,
-        signal=signal,
-        explanation=explanation,
-        format_type="percent",
-    )
+        return None, None, None
+    return (fin.dps / fin.eps) * 100, None, None
 
 
-def _evaluate_debt_to_equity(fin: StockFinancials) -> NapkinMetric:
+def _debt_to_equity_values(fin: StockFinancials) -> tuple[float | None, float | None, float | None]:
     if fin.total_debt is None or fin.shareholder_equity is None or fin.shareholder_equity == 0:
-        return NapkinMetric(
-            name="Debt-to-Equity",
-            signal=Signal.YELLOW,
-            explanation="Insufficient data to calculate D/E ratio",
-            format_type="ratio",
-        )
-
-    ratio = fin.total_debt / fin.shareholder_equity
-
-    if fin.shareholder_equity < 0:
-        signal = Signal.RED
-        explanation = f"Negative equity — company's liabilities exceed assets. D/E: {ratio:.2f}×"
-    elif ratio < 1.0:
-        signal = Signal.GREEN
-        explanation = f"D/E of {ratio:.2f}× is conservative — debt well below equity"
-    elif ratio <= 1.5:
-        signal = Signal.GREEN
-        explanation = f"D/E of {ratio:.2f}× is within the healthy range (below 1.5×)"
-    elif ratio <= 2.0:
-        signal = Signal.YELLOW
-        explanation = f"D/E of {ratio:.2f}× is moderate — approaching the 2.0× warning level"
-    else:
-        signal = Signal.RED
-        explanation = f"D/E of {ratio:.2f}× exceeds 2.0× — high debt burden is a red flag"
+        return None, None, None
+    return fin.total_debt / fin.shareholder_equity, None, None
 
-    return NapkinMetric(
-        name="Debt-to-Equity",
-        current_value=ratio,
-        signal=signal,
-        explanation=explanation,
-        format_type="ratio",
-    )
 
-
-def _evaluate_roe(fin: StockFinancials) -> NapkinMetric:
+def _roe_values(fin: StockFinancials) -> tuple[float | None, float | None, float | None]:
     if fin.pat is None or fin.shareholder_equity is None or fin.shareholder_equity <= 0:
-        return NapkinMetric(
-            name="Return on Equity (ROE)",
-            signal=Signal.YELLOW,
-            explanation="Cannot calculate ROE — missing data or negative equity",
-            format_type="percent",
-        )
-
-    roe = (fin.pat / fin.shareholder_equity) * 100
-
-    if roe >= 15:
-        signal = Signal.GREEN
-        explanation = f"ROE of {roe:.1f}% is above the 15% threshold — strong returns"
-    elif roe >= 8:
-        signal = Signal.YELLOW
-        explanation = f"ROE of {roe:.1f}% is moderate — between 8-15%"
-    elif roe >= 0:
-        signal = Signal.RED
-        explanation = f"ROE of {roe:.1f}% is below 8% — poor return on equity"
-    else:
-        signal = Signal.RED
-        explanation = f"Negative ROE ({roe:.1f}%) — company is destroying shareholder value"
-
-    return NapkinMetric(
-        name="Return on Equity (ROE)",
-        current_value=roe,
-        signal=signal,
-        explanation=explanation,
-        format_type="percent",
-    )
+        return None, None, None
+    return (fin.pat / fin.shareholder_equity) * 100, None, None
 
 
-def _evaluate_operating_cashflow(fin: StockFinancials) -> NapkinMetric:
-    yoy = _pct_change(fin.operating_cash_flow, fin.prev_operating_cash_flow)
-
+def _operating_cashflow_values(fin: StockFinancials) -> tuple[float | None, float | None, float | None]:
     if fin.operating_cash_flow is None:
-        return NapkinMetric(
-            name="Operating Cash Flow",
-            signal=Signal.YELLOW,
-            explanation="No operating cash flow data available",
-            format_type="currency",
-        )
-
-    if fin.operating_cash_flow < 0:
-        signal = Signal.RED
-        explanation = f"Negative operating cash flow ({_fmt_naira(fin.operating_cash_flow)}) — business is burning cash"
-    elif yoy is not None and yoy > 0:
-        signal = Signal.GREEN
-        explanation = f"Operating cash flow grew {yoy:.1f}% YoY — positive and growing"
-    elif yoy is not None and yoy > -10:
-        signal = Signal.YELLOW
-        explanation = f"Operating cash flow changed {yoy:.1f}% YoY — still positive but declining slightly"
-    elif yoy is not None:
-        signal = Signal.YELLOW
-        explanation = f"Operating cash flow declined {yoy:.1f}% YoY — still positive but shrinking"
-    else:
-        signal = Signal.GREEN
-        explanation = f"Positive operating cash flow of {_fmt_naira(fin.operating_cash_flow)}"
-
+        return None, None, None
+    return _yoy_values("operating_cash_flow", "prev_operating_cash_flow")(fin)
+
+
+_METRICS: list[_MetricSpec] = [
+    _MetricSpec("Revenue", "currency", _yoy_values("revenue", "prev_revenue"), [
+        (lambda f, v, y: y is not None and y >= 10, Signal.GREEN,
+         "Revenue grew {yoy:.1f}% YoY — strong growth above 10% threshold"),
+        (lambda f, v, y: y is not None and y > 0, Signal.YELLOW,
+         "Revenue grew {yoy:.1f}% YoY — positive but below the 10-15% ideal"),
+        (lambda f, v, y: y is not None, Signal.RED,
+         "Revenue declined {yoy:.1f}% YoY — flat or declining revenue is a red flag"),
+        (_always, Signal.YELLOW, "Insufficient data to calculate YoY revenue change"),
+    ]),
+    _MetricSpec("Profit After Tax", "currency", _yoy_values("pat", "prev_pat"), [
+        (lambda f, v, y: v is not None and v < 0, Signal.RED,
+         "Net loss of {naira} — company is not profitable"),
+        (lambda f, v, y: y is not None and y > 0, Signal.GREEN,
+         "Profit After Tax grew {yoy:.1f}% YoY — profitability is improving"),
+        (lambda f, v, y: y is not None and y > -10, Signal.YELLOW,
+         "PAT changed {yoy:.1f}% YoY — relatively flat"),
+        (lambda f, v, y: y is not None, Signal.RED,
+         "PAT declined {yoy:.1f}% YoY — consistent profit decline is a warning"),
+        (_always, Signal.YELLOW, "Insufficient data to calculate PAT trend"),
+    ]),
+    _MetricSpec("Earnings Per Share (EPS)", "number", _yoy_values("eps", "prev_eps"), [
+        (lambda f, v, y: v is not None and v < 0, Signal.RED,
+         "Negative EPS ({naira}) — company is losing money per share"),
+        (lambda f, v, y: y is not None and y > 0, Signal.GREEN,
+         "EPS increased {yoy:.1f}% YoY — earnings per share growing"),
+        (lambda f, v, y: y is not None and y > -5, Signal.YELLOW,
+         "EPS roughly flat ({yoy:.1f}% YoY)"),
+        (lambda f, v, y: y is not None, Signal.RED,
+         "EPS fell {yoy:.1f}% YoY — declining earnings is a red flag"),
+        (_always, Signal.YELLOW, "Insufficient data to evaluate EPS trend"),
+    ]),
+    _MetricSpec("Dividend Per Share (DPS)", "number", _dps_values, [
+        (lambda f, v, y: not v and f.prev_dps is not None and f.prev_dps > 0, Signal.RED,
+         "Dividend was cut or skipped — previously paid a dividend"),
+        (lambda f, v, y: not v, Signal.YELLOW,
+         "No dividend paid — not necessarily bad for growth stocks"),
+        (lambda f, v, y: y is not None and y > 0, Signal.GREEN,
+         "DPS increased {yoy:.1f}% YoY — dividend is growing"),
+        (lambda f, v, y: y is not None and y >= -5, Signal.GREEN,
+         "DPS stable ({yoy:.1f}% YoY) — consistent dividend"),
+        (lambda f, v, y: y is not None, Signal.RED,
+         "DPS declined {yoy:.1f}% YoY — dividend cut is a warning sign"),
+        (_always, Signal.GREEN, "Paying dividend of ₦{value:.2f} per share"),
+    ]),
+    _MetricSpec("Payout Ratio", "percent", _payout_ratio_values, [
+        (lambda f, v, y: v is None, Signal.YELLOW,
+         "Cannot calculate — EPS is zero/negative or no dividend"),
+        (lambda f, v, y: 30 <= v <= 70, Signal.GREEN,
+         "Payout ratio of {value:.0f}% is in the healthy 30-70% range"),
+        (lambda f, v, y: v < 30, Signal.YELLOW,
+         "Payout ratio of {value:.0f}% is low — company retains most earnings"),
+        (lambda f, v, y: v <= 100, Signal.YELLOW,
+         "Payout ratio of {value:.0f}% is high — approaching sustainability limits"),
+        (_always, Signal.RED,
+         "Payout ratio of {value:.0f}% exceeds 100% — unsustainable, paying more than earned"),
+    ]),
+    _MetricSpec("Debt-to-Equity", "ratio", _debt_to_equity_values, [
+        (lambda f, v, y: v is None, Signal.YELLOW, "Insufficient data to calculate D/E ratio"),
+        (lambda f, v, y: f.shareholder_equity < 0, Signal.RED,
+         "Negative equity — company's liabilities exceed assets. D/E: {value:.2f}×"),
+        (lambda f, v, y: v < 1.0, Signal.GREEN,
+         "D/E of {value:.2f}× is conservative — debt well below equity"),
+        (lambda f, v, y: v <= 1.5, Signal.GREEN,
+         "D/E of {value:.2f}× is within the healthy range (below 1.5×)"),
+        (lambda f, v, y: v <= 2.0, Signal.YELLOW,
+         "D/E of {value:.2f}× is moderate — approaching the 2.0× warning level"),
+        (_always, Signal.RED,
+         "D/E of {value:.2f}× exceeds 2.0× — high debt burden is a red flag"),
+    ]),
+    _MetricSpec("Return on Equity (ROE)", "percent", _roe_values, [
+        (lambda f, v, y: v is None, Signal.YELLOW,
+         "Cannot calculate ROE — missing data or negative equity"),
+        (lambda f, v, y: v >= 15, Signal.GREEN,
+         "ROE of {value:.1f}% is above the 15% threshold — strong returns"),
+        (lambda f, v, y: v >= 8, Signal.YELLOW,
+         "ROE of {value:.1f}% is moderate — between 8-15%"),
+        (lambda f, v, y: v >= 0, Signal.RED,
+         "ROE of {value:.1f}% is below 8% — poor return on equity"),
+        (_always, Signal.RED,
+         "Negative ROE ({value:.1f}%) — company is destroying shareholder value"),
+    ]),
+    _MetricSpec("Operating Cash Flow", "currency", _operating_cashflow_values, [
+        (lambda f, v, y: v is None, Signal.YELLOW, "No operating cash flow data available"),
+        (lambda f, v, y: v < 0, Signal.RED,
+         "Negative operating cash flow ({naira}) — business is burning cash"),
+        (lambda f, v, y: y is not None and y > 0, Signal.GREEN,
+         "Operating cash flow grew {yoy:.1f}% YoY — positive and growing"),
+        (lambda f, v, y: y is not None and y > -10, Signal.YELLOW,
+         "Operating cash flow changed {yoy:.1f}% YoY — still positive but declining slightly"),
+        (lambda f, v, y: y is not None, Signal.YELLOW,
+         "Operating cash flow declined {yoy:.1f}% YoY — still positive but shrinking"),
+        (_always, Signal.GREEN, "Positive operating cash flow of {naira}"),
+    ]),
+]
+
+
+def _evaluate(fin: StockFinancials, spec: _MetricSpec) -> NapkinMetric:
+    """Evaluate one metric: the first rule whose predicate matches sets the signal."""
+    current, previous, yoy = spec.values(fin)
+    for predicate, signal, template in spec.rules:
+        if predicate(fin, current, yoy):
+            break
     return NapkinMetric(
-        name="Operating Cash Flow",
-        current_value=fin.operating_cash_flow,
-        previous_value=fin.prev_operating_cash_flow,
+        name=spec.name,
+        current_value=current,
+        previous_value=previous,
         yoy_change=yoy,
         signal=signal,
-        explanation=explanation,
-        format_type="currency",
+        explanation=template.format(value=current, yoy=yoy, naira=fmt_naira(current)),
+        format_type=spec.format_type,
     )
 
 
@@ -299,22 +194,26 @@ def analyze_stock(fin: StockFinancials) -> NapkinResult:
     """Run the full Napkin Math analysis on a stock's financials.
 
     Returns a NapkinResult with all 8 metrics evaluated and an overall
-    Buy/Hold/Sell recommendation.
+    Buy/Hold/Sell recommendation. Results are memoized on the financials'
+    field values, so the returned object is shared and must not be mutated.
     """
-    metrics = [
-        _evaluate_revenue(fin),
-        _evaluate_pat(fin),
-        _evaluate_eps(fin),
-        _evaluate_dps(fin),
-        _evaluate_payout_ratio(fin),
-        _evaluate_debt_to_equity(fin),
-        _evaluate_roe(fin),
-        _evaluate_operating_cashflow(fin),
-    ]
-
-    green_count = sum(1 for m in metrics if m.signal == Signal.GREEN)
-    yellow_count = sum(1 for m in metrics if m.signal == Signal.YELLOW)
-    red_count = sum(1 for m in metrics if m.signal == Signal.RED)
+    return _analyze_cached(fin.cache_key())
+
+
+def clear_analysis_cache():
+    """Drop all memoized analysis results."""
+    _analyze_cached.cache_clear()
+
+
+@lru_cache(maxsize=512)
+def _analyze_cached(key: tuple) -> NapkinResult:
+    fin = StockFinancials.from_cache_key(key)
+    metrics = [_evaluate(fin, spec) for spec in _METRICS]
+
+    counts = Counter(m.signal for m in metrics)
+    green_count = counts[Signal.GREEN]
+    yellow_count = counts[Signal.YELLOW]
+    red_count = counts[Signal.RED]
 
     # Decision framework
     if red_count >= 2:
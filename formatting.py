@@ -0,0 +1,16 @@
+"""Display formatting helpers shared by the analyzer and the templates."""
+
+
+def fmt_naira(value: float | None, minus: str = "−", symbol: str = "₦") -> str:
+    """Format a number as Naira with a T/B/M suffix for large amounts."""
+    if value is None:
+        return "N/A"
+    abs_val = abs(value)
+    sign = minus if value < 0 else ""
+    if abs_val >= 1_000_000_000_000:
+        return f"{sign}{symbol}{abs_val / 1_000_000_000_000:.2f}T"
+    if abs_val >= 1_000_000_000:
+        return f"{sign}{symbol}{abs_val / 1_000_000_000:.2f}B"
+    if abs_val >= 1_000_000:
+        return f"{sign}{symbol}{abs_val / 1_000_000:.2f}M"
+    return f"{sign}{symbol}{abs_val:,.2f}"
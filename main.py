@@ -1,42 +1,162 @@
 """Napkin Math NGX Stock Analyzer — FastAPI application."""
 
 import asyncio
+import hashlib
+import inspect
+import os
+import time
+from contextlib import asynccontextmanager, suppress
+from email.utils import formatdate
+from functools import lru_cache
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Query
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from analyzer import analyze_stock
-from models import NapkinResult
+from formatting import fmt_naira
+from models import NapkinResult, StockFinancials
 from ngx_tickers import ALL_TICKERS, TOP_30, search_tickers
-from scraper import fetch_stock_financials
-
-app = FastAPI(title="Napkin Math NGX")
+from scraper import (
+    CACHE_TTL,
+    cache_timestamp,
+    fetch_stock_financials,
+    is_cached,
+    register_cache_clear,
+)
+
+# NAPKIN_ENV=production compiles templates once and fixes the render version at
+# startup. The default (development) keeps Jinja auto-reload, so template edits
+# show up under `uvicorn --reload`, which only restarts on .py changes.
+PRODUCTION = os.environ.get("NAPKIN_ENV", "development") == "production"
+
+# Warm-up runs by default only in production, so tests and dev reloads don't
+# scrape; NAPKIN_WARM_CACHE=1 or =0 overrides that either way
+WARM_CACHE = os.environ.get("NAPKIN_WARM_CACHE", "1" if PRODUCTION else "0") != "0"
+WARM_DELAY = 1.5  # seconds between warm-up tickers, leaving room for live requests
+
+
+async def _warm_cache(tickers: list[str]):
+    """Fetch tickers one at a time, pausing between them so users are not starved."""
+    for ticker in tickers:
+        try:
+            await fetch_stock_financials(ticker)
+        except Exception:
+            pass  # Best-effort; the ticker is fetched on demand instead
+        await asyncio.sleep(WARM_DELAY)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prime the scraper cache in the background for TOP_30 tickers not already cached."""
+    app.state.warm = None
+    if WARM_CACHE:
+        tickers = [t for t in TOP_30 if not is_cached(t)]
+        app.state.warm = asyncio.create_task(_warm_cache(tickers))
+    yield
+    if app.state.warm is not None:
+        app.state.warm.cancel()
+        with suppress(asyncio.CancelledError):
+            await app.state.warm
+
+
+app = FastAPI(title="Napkin Math NGX", lifespan=lifespan)
 
 BASE_DIR = Path(__file__).resolve().parent
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 templates = Jinja2Templates(directory=BASE_DIR / "templates")
 
+# Make format_naira available in all templates
+templates.env.globals["format_naira"] = fmt_naira
+
+# In production, compile every template once at import and skip the
+# per-render stat() that checks for changes
+if PRODUCTION:
+    templates.env.auto_reload = False
+    for _name in ("index.html", "analysis.html", "compare.html", "error.html"):
+        templates.env.get_template(_name)
 
-def format_naira(value: float | None) -> str:
-    """Format a number as Naira with appropriate suffix."""
-    if value is None:
-        return "N/A"
-    abs_val = abs(value)
-    sign = "\u2212" if value < 0 else ""
-    if abs_val >= 1_000_000_000_000:
-        return f"{sign}\u20a6{abs_val / 1_000_000_000_000:.2f}T"
-    if abs_val >= 1_000_000_000:
-        return f"{sign}\u20a6{abs_val / 1_000_000_000:.2f}B"
-    if abs_val >= 1_000_000:
-        return f"{sign}\u20a6{abs_val / 1_000_000:.2f}M"
-    return f"{sign}\u20a6{abs_val:,.2f}"
 
+def _render_version() -> bytes:
+    """Digest of the code and templates that shape the analysis page.
 
-# Make format_naira available in all templates
-templates.env.globals["format_naira"] = format_naira
+    Folded into the ETag so cached pages are invalidated when a deploy changes
+    the analyzer rules, explanation text, formatting or templates.
+    """
+    sources = [
+        BASE_DIR / "templates" / "base.html",
+        BASE_DIR / "templates" / "analysis.html",
+        Path(inspect.getfile(analyze_stock)),
+        Path(inspect.getfile(fmt_naira)),
+    ]
+    digest = hashlib.blake2b(digest_size=8)
+    for path in sources:
+        digest.update(path.read_bytes())
+    return digest.digest()
+
+
+_RENDER_VERSION = _render_version()
+
+
+def _current_render_version() -> bytes:
+    """Render version for this request.
+
+    Fixed at import in production. Re-read in development, so template edits
+    change the ETag and bypass previously rendered pages.
+    """
+    return _RENDER_VERSION if PRODUCTION else _render_version()
+
+
+def _etag(financials: StockFinancials, version: bytes) -> str:
+    """Weak ETag derived from the render version and the financials' field values.
+
+    Stable across processes, so every worker and restart agrees on it.
+    """
+    digest = hashlib.blake2b(version, digest_size=8)
+    digest.update(repr(financials.cache_key()).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def _cache_headers(etag: str, fetched_at: float) -> dict[str, str]:
+    """HTTP caching headers letting browsers/CDNs reuse a page until the data cache expires.
+
+    Shared caches revalidate with the ETag, which carries the render version,
+    so a deploy that changes the page is picked up once max-age runs out.
+    """
+    max_age = max(0, int(CACHE_TTL - (time.time() - fetched_at)))
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Last-Modified": formatdate(fetched_at, usegmt=True),
+    }
+
+
+@lru_cache(maxsize=256)
+def _render_analysis(key: tuple, version: bytes) -> str:
+    """Render analysis.html for a stock, memoized on ``StockFinancials.cache_key()``.
+
+    The page depends only on the financials and the render version, so those
+    make up the key.
+    """
+    financials = StockFinancials.from_cache_key(key)
+    result = analyze_stock(financials)
+    return templates.get_template("analysis.html").render(result=result)
+
+
+# scraper.clear_cache() also drops rendered pages
+register_cache_clear(_render_analysis.cache_clear)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -66,11 +186,13 @@ async def analyze(request: Request, ticker: str):
                        "unavailable, or this company doesn't have financial statements published yet.",
         }, status_code=404)
 
-    result = analyze_stock(financials)
-    return templates.TemplateResponse("analysis.html", {
-        "request": request,
-        "result": result,
-    })
+    version = _current_render_version()
+    etag = _etag(financials, version)
+    headers = _cache_headers(etag, cache_timestamp(ticker) or time.time())
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return HTMLResponse(_render_analysis(financials.cache_key(), version), headers=headers)
 
 
 @app.get("/compare", response_class=HTMLResponse)
@@ -81,11 +203,14 @@ async def compare(request: Request, tickers: str = Query(default="")):
     results: list[NapkinResult] = []
 
     if ticker_list:
-        # Fetch all stocks concurrently
+        # Fetch each distinct stock once, concurrently, then map back in order
+        unique = list(dict.fromkeys(ticker_list))
         financials_list = await asyncio.gather(
-            *[fetch_stock_financials(t) for t in ticker_list]
+            *[fetch_stock_financials(t) for t in unique]
         )
-        for fin in financials_list:
+        fetched = dict(zip(unique, financials_list))
+        for ticker in ticker_list:
+            fin = fetched[ticker]
             if fin is not None:
                 results.append(analyze_stock(fin))
 
@@ -95,8 +220,7 @@ async def compare(request: Request, tickers: str = Query(default="")):
     })
 
 
-@app.get("/api/search")
+@app.get("/api/search", response_class=ORJSONResponse)
 async def api_search(q: str = Query(default="", min_length=1)):
-    results = search_tickers(q)
-    return JSONResponse(content=results)
+    return search_tickers(q)
 
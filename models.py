@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from dataclasses import dataclass, field
 from enum import Enum
 
+from pydantic import BaseModel
+
 
 class Signal(str, Enum):
     GREEN = "green"
@@ -37,8 +39,25 @@ class StockFinancials(BaseModel):
     current_year: str = ""
     previous_year: str = ""
 
+    def cache_key(self) -> tuple:
+        """Hashable snapshot of every field, used to memoize derived results.
+
+        The model itself stays unhashable since the scraper fills it in after
+        construction; memo caches key on this tuple instead.
+        """
+        return tuple(getattr(self, name) for name in type(self).model_fields)
+
+    @classmethod
+    def from_cache_key(cls, key: tuple) -> "StockFinancials":
+        """Rebuild financials from a cache_key() tuple."""
+        return cls(**dict(zip(cls.model_fields, key)))
+
 
-class NapkinMetric(BaseModel):
+# Analysis results are built internally by analyzer.py, so they are plain
+# slotted dataclasses rather than validated Pydantic models. StockFinancials
+# stays Pydantic since it is loaded from scraped and cached data.
+@dataclass(slots=True, frozen=True)
+class NapkinMetric:
     name: str
     current_value: float | None = None
     previous_value: float | None = None
@@ -48,12 +67,13 @@ class NapkinMetric(BaseModel):
     format_type: str = "number"  # "number", "currency", "percent", "ratio"
 
 
-class NapkinResult(BaseModel):
+@dataclass(slots=True, frozen=True)
+class NapkinResult:
     ticker: str
     company_name: str
     current_year: str = ""
     previous_year: str = ""
-    metrics: list[NapkinMetric] = []
+    metrics: list[NapkinMetric] = field(default_factory=list)
     recommendation: Recommendation = Recommendation.HOLD
     green_count: int = 0
     yellow_count: int = 0
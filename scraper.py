@@ -6,18 +6,34 @@ balance sheet, and cash flow statement pages.
 
 import asyncio
 import json
+import os
 import re
+import tempfile
 import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, NamedTuple
 
 import httpx
+import pyjson5
 
+from analyzer import clear_analysis_cache
 from models import StockFinancials
 from ngx_tickers import ALL_TICKERS
 
-# In-memory cache: {ticker: (StockFinancials, timestamp)}
+# In-memory cache (L1): {ticker: (StockFinancials, timestamp)}
 _cache: dict[str, tuple[StockFinancials, float]] = {}
 CACHE_TTL = 3600  # 1 hour
 
+# On-disk cache (L2): one JSON file per ticker, survives reloads and restarts
+CACHE_DIR = Path(os.environ.get("NAPKIN_CACHE_DIR", Path(__file__).resolve().parent / ".cache"))
+# Distinctive suffixes, so clear_cache() only ever touches files this module wrote
+_CACHE_SUFFIX = ".financials.json"
+_TMP_SUFFIX = ".financials.tmp"
+# Valid ticker symbols. Tickers end up in URLs and cache file names, so
+# anything else (e.g. "../x") is rejected before any network or disk access.
+_TICKER_RE = re.compile(r"[A-Z0-9][A-Z0-9.]*")
+
 BASE_URL = "https://stockanalysis.com/quote/ngx"
 
 HEADERS = {
@@ -26,75 +42,168 @@ HEADERS = {
     "Accept-Language": "en-US,en;q=0.5",
 }
 
+# Extra caches (e.g. rendered pages in main.py) emptied by clear_cache()
+_cache_clear_hooks: list[Callable[[], None]] = []
 
-def _extract_financial_data(html: str) -> dict | None:
-    """Extract the financialData JSON object from SvelteKit page source."""
-    # The data is embedded in a SvelteKit init script as part of a data array.
-    # Look for the financialData object which contains arrays of financial metrics.
-    pattern = r'financialData:\{([^}]+(?:\{[^}]*\}[^}]*)*)\}'
-    match = re.search(pattern, html)
-    if not match:
+# Caps concurrent requests to stockanalysis.com across all tickers
+_request_semaphore = asyncio.Semaphore(2)
+
+# Fields read by the per-array fallback extractor
+_FALLBACK_FIELDS = [
+    "datekey", "fiscalYear", "revenue", "netinc", "epsBasic", "dps",
+    "payoutratio", "debt", "equity", "ncfo",
+]
+
+_FINDATA_MARKER = "financialData:{"
+_FALLBACK_MARKER = '"financialData":'
+
+# Matches any fallback field's array, quoted ("revenue": [...]) or not (revenue:[...])
+_FALLBACK_ARRAY_RE = re.compile(
+    r'"?\b(' + "|".join(_FALLBACK_FIELDS) + r')"?:\s*\[([^\]]*)\]'
+)
+
+
+# Tokens the brace matcher stops at, outside and inside double-quoted strings.
+# Inside a string an escape is consumed together with the character it escapes.
+_BRACE_TOKEN_RE = re.compile(r'[{}"]')
+_STRING_TOKEN_RE = re.compile(r'\\.|"', re.DOTALL)
+
+
+class _BraceMatcher:
+    """Finds the brace closing the one at ``start``, resumable as the text grows.
+
+    Braces inside double-quoted strings are ignored. The scan jumps between
+    braces, quotes and escapes with compiled regexes, and its state is kept
+    between calls to ``scan``, so text that arrives in chunks is only walked once.
+    """
+
+    def __init__(self, start: int):
+        self.pos = start
+        self.depth = 0
+        self.in_string = False
+
+    def scan(self, text: str) -> int:
+        """Continue scanning ``text``; return the closing brace's index, or -1 if not yet seen."""
+        pos, depth, in_string = self.pos, self.depth, self.in_string
+        while True:
+            if in_string:
+                match = _STRING_TOKEN_RE.search(text, pos)
+                if match is None:
+                    # A trailing backslash may escape the next chunk's first character
+                    if len(text) > pos and text[-1] == "\\":
+                        pos = len(text) - 1
+                    else:
+                        pos = len(text)
+                    break
+                pos = match.end()
+                if match.group() == '"':
+                    in_string = False
+                continue
+
+            match = _BRACE_TOKEN_RE.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            pos = match.end()
+            token = match.group()
+            if token == '"':
+                in_string = True
+            elif token == "{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    self.pos, self.depth, self.in_string = pos, 0, False
+                    return match.start()
+        self.pos, self.depth, self.in_string = pos, depth, in_string
+        return -1
+
+
+def _match_brace(text: str, start: int) -> int:
+    """Return the index of the brace closing the one at ``text[start]``, or -1.
+
+    Braces inside double-quoted strings are ignored.
+    """
+    return _BraceMatcher(start).scan(text)
+
+
+def _find_financial_data(html: str) -> str | None:
+    """Return the raw ``{...}`` JS object literal following ``financialData:``."""
+    i = html.find(_FINDATA_MARKER)
+    if i < 0:
+        return None
+    start = i + len(_FINDATA_MARKER) - 1
+    end = _match_brace(html, start)
+    if end < 0:
         return None
+    return html[start:end + 1]
 
-    raw = "{" + match.group(1) + "}"
 
-    # The JS object uses unquoted keys — convert to valid JSON
-    # Add quotes around keys
-    json_str = re.sub(r'(?<=[{,])(\w+):', r'"\1":', raw)
-    # Handle JS number literals like .28293 → 0.28293
-    json_str = re.sub(r'(?<=[:,\[])\.(\d)', r'0.\1', json_str)
-    # Handle negative decimals like -.123
-    json_str = re.sub(r'(?<=[:,\[])-\.(\d)', r'-0.\1', json_str)
-    # Handle null values (sometimes appears as bare null in JS)
-    json_str = json_str.replace(":null", ":null")
+def _extract_financial_data(html: str, raw: str | None = None) -> dict | None:
+    """Extract the financialData JSON object from SvelteKit page source.
+
+    ``raw`` is the financialData literal when it has already been located
+    (by the streaming probe); otherwise the page is searched for it.
+    """
+    # The data is embedded in a SvelteKit init script as part of a data array.
+    # Look for the financialData object which contains arrays of financial metrics.
+    if raw is None:
+        raw = _find_financial_data(html)
+    if raw is None:
+        return None
 
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError:
+        return _parse_literal(raw)
+    except pyjson5.Json5Exception:
         # Fallback: try a more aggressive extraction approach
         return _extract_financial_data_fallback(html)
 
 
-def _extract_financial_data_fallback(html: str) -> dict | None:
-    """Fallback extraction using a broader regex pattern."""
-    # Try to find the data block containing financialData
-    # Look for the pattern within the SvelteKit data array
-    pattern = r'"financialData":\s*(\{[^<]+?\})\s*[,}]'
-    match = re.search(pattern, html)
-    if match:
+@lru_cache(maxsize=128)
+def _parse_literal(raw: str) -> dict:
+    """Parse a financialData object literal. Memoized, so the returned dict is shared.
+
+    The JS object literal (unquoted keys, numbers like .28293) is valid JSON5.
+    """
+    return pyjson5.loads(raw)
+
+
+def _parse_array(raw_array: str) -> list:
+    """Parse the body of a JS array literal into numbers, strings and None."""
+    values = []
+    for item in raw_array.split(","):
+        item = item.strip().strip('"')
+        if item == "null" or item == "":
+            values.append(None)
+            continue
         try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
+            values.append(float(item) if "." in item else int(item))
+        except ValueError:
+            values.append(item)  # String value like date
+    return values
 
-    # Another fallback: extract individual arrays
-    result = {}
-    fields = [
-        "datekey", "fiscalYear", "revenue", "netinc", "epsBasic", "dps",
-        "payoutratio", "debt", "equity", "ncfo",
-    ]
-    for field in fields:
-        pattern = rf'"{field}":\s*\[([^\]]*)\]|{field}:\s*\[([^\]]*)\]'
-        match = re.search(pattern, html)
-        if match:
-            raw_array = match.group(1) or match.group(2)
+
+def _extract_financial_data_fallback(html: str) -> dict | None:
+    """Fallback extraction for quoted-JSON pages and individual arrays."""
+    # Try to find the data block containing financialData as quoted JSON
+    i = html.find(_FALLBACK_MARKER)
+    if i >= 0:
+        start = html.find("{", i + len(_FALLBACK_MARKER))
+        end = _match_brace(html, start) if start >= 0 else -1
+        if end >= 0:
             try:
-                # Parse the array values
-                values = []
-                for item in raw_array.split(","):
-                    item = item.strip().strip('"')
-                    if item == "null" or item == "":
-                        values.append(None)
-                    elif item.startswith("."):
-                        values.append(float("0" + item))
-                    else:
-                        try:
-                            values.append(float(item) if "." in item else int(item))
-                        except ValueError:
-                            values.append(item)  # String value like date
-                result[field] = values
-            except Exception:
-                continue
+                return pyjson5.loads(html[start:end + 1])
+            except pyjson5.Json5Exception:
+                pass
+
+    # Another fallback: extract individual arrays (first occurrence of each) in one scan
+    result = {}
+    for match in _FALLBACK_ARRAY_RE.finditer(html):
+        field = match.group(1)
+        if field not in result:
+            result[field] = _parse_array(match.group(2))
+            if len(result) == len(_FALLBACK_FIELDS):
+                break
 
     return result if result else None
 
@@ -125,14 +234,108 @@ def _get_year_label(data: dict, index: int) -> str:
     return ""
 
 
-async def _fetch_page(client: httpx.AsyncClient, url: str) -> str | None:
-    """Fetch a page with retries."""
+def _cache_path(ticker: str) -> Path | None:
+    """Path of the on-disk cache file for a ticker, or None if it is not a safe file name."""
+    if not _TICKER_RE.fullmatch(ticker):
+        return None
+    return CACHE_DIR / f"{ticker}{_CACHE_SUFFIX}"
+
+
+def _load_cached(ticker: str) -> tuple[StockFinancials, float] | None:
+    """Load a fresh cache entry from disk, or None if missing or stale."""
+    path = _cache_path(ticker)
+    if path is None:
+        return None
+    try:
+        row = json.loads(path.read_text(encoding="utf-8"))
+        if time.time() - row["ts"] >= CACHE_TTL:
+            return None
+        return StockFinancials.model_validate(row["data"]), row["ts"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _store_cached(ticker: str, financials: StockFinancials, ts: float) -> None:
+    """Write a cache entry to disk. Failures are ignored — the cache is best-effort."""
+    path = _cache_path(ticker)
+    if path is None:
+        return
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Unique temp name per writer, so concurrent workers never share one
+        tmp = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=CACHE_DIR, suffix=_TMP_SUFFIX, delete=False
+        )
+    except OSError:
+        return
+    try:
+        with tmp:
+            json.dump({"ts": ts, "data": financials.model_dump()}, tmp)
+        os.replace(tmp.name, path)
+    except OSError:
+        try:
+            os.unlink(tmp.name)
+        except OSError:
+            pass
+
+
+class _FinancialDataProbe:
+    """Streaming probe: true once the text so far holds a complete financialData object.
+
+    Called with the growing page body after each chunk. The marker search and
+    the brace walk both resume where the previous call stopped, so each
+    character is examined once however many chunks arrive. Once it has
+    returned True, ``literal`` holds the raw ``{...}`` object so extraction
+    does not have to scan for it again.
+    """
+
+    def __init__(self):
+        self.searched = 0
+        self.matcher: _BraceMatcher | None = None
+        self.start = -1
+        self.literal: str | None = None
+
+    def __call__(self, html: str) -> bool:
+        if self.matcher is None:
+            i = html.find(_FINDATA_MARKER, self.searched)
+            if i < 0:
+                # The marker may straddle the chunk boundary
+                self.searched = max(0, len(html) - len(_FINDATA_MARKER) + 1)
+                return False
+            self.start = i + len(_FINDATA_MARKER) - 1
+            self.matcher = _BraceMatcher(self.start)
+        end = self.matcher.scan(html)
+        if end < 0:
+            return False
+        self.literal = html[self.start:end + 1]
+        return True
+
+
+class _Page(NamedTuple):
+    html: str
+    financial_data: str | None  # raw financialData literal, if seen while streaming
+
+
+async def _fetch_page(client: httpx.AsyncClient, url: str) -> _Page | None:
+    """Fetch a statement page with retries.
+
+    The body is streamed and the download stops as soon as the financialData
+    object is complete; the partial page is returned along with that literal.
+    """
     for attempt in range(3):
         try:
-            resp = await client.get(url, headers=HEADERS, follow_redirects=True)
-            if resp.status_code == 200:
-                return resp.text
-            if resp.status_code == 429:
+            async with _request_semaphore:
+                async with client.stream("GET", url, headers=HEADERS, follow_redirects=True) as resp:
+                    status = resp.status_code
+                    if status == 200:
+                        body = ""
+                        probe = _FinancialDataProbe()
+                        async for chunk in resp.aiter_text():
+                            body += chunk
+                            if probe(body):
+                                break
+                        return _Page(body, probe.literal)
+            if status == 429:
                 await asyncio.sleep(5 * (attempt + 1))
                 continue
         except httpx.HTTPError:
@@ -142,45 +345,50 @@ async def _fetch_page(client: httpx.AsyncClient, url: str) -> str | None:
     return None
 
 
-async def fetch_stock_financials(ticker: str) -> StockFinancials | None:
-    """Fetch financial data for an NGX stock from stockanalysis.com.
-
-    Scrapes the income statement, balance sheet, and cash flow pages
-    to extract the 8 Napkin Math metrics for the latest 2 fiscal years.
-    """
-    ticker = ticker.upper().strip()
-
-    # Check cache
+def _get_cached(ticker: str) -> StockFinancials | None:
+    """Fresh cached financials from memory, then disk (promoted to memory), or None."""
     if ticker in _cache:
         cached, ts = _cache[ticker]
         if time.time() - ts < CACHE_TTL:
             return cached
 
-    company_name = ALL_TICKERS.get(ticker, ticker)
+    entry = _load_cached(ticker)
+    if entry is not None:
+        _cache[ticker] = entry
+        return entry[0]
+    return None
 
-    income_data = None
-    balance_data = None
-    cashflow_data = None
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # Fetch income statement
-        html = await _fetch_page(client, f"{BASE_URL}/{ticker}/financials/")
-        if html:
-            income_data = _extract_financial_data(html)
+async def fetch_stock_financials(ticker: str) -> StockFinancials | None:
+    """Fetch financial data for an NGX stock from stockanalysis.com.
 
-        await asyncio.sleep(1.5)  # Rate limiting
+    Scrapes the income statement, balance sheet, and cash flow pages
+    to extract the 8 Napkin Math metrics for the latest 2 fiscal years.
+    """
+    ticker = ticker.upper().strip()
+    if not _TICKER_RE.fullmatch(ticker):
+        return None
 
-        # Fetch balance sheet
-        html = await _fetch_page(client, f"{BASE_URL}/{ticker}/financials/balance-sheet/")
-        if html:
-            balance_data = _extract_financial_data(html)
+    cached = _get_cached(ticker)
+    if cached is not None:
+        return cached
 
-        await asyncio.sleep(1.5)
+    company_name = ALL_TICKERS.get(ticker, ticker)
 
-        # Fetch cash flow statement
-        html = await _fetch_page(client, f"{BASE_URL}/{ticker}/financials/cash-flow-statement/")
-        if html:
-            cashflow_data = _extract_financial_data(html)
+    urls = [
+        f"{BASE_URL}/{ticker}/financials/",
+        f"{BASE_URL}/{ticker}/financials/balance-sheet/",
+        f"{BASE_URL}/{ticker}/financials/cash-flow-statement/",
+    ]
+    limits = httpx.Limits(max_connections=8)
+    async with httpx.AsyncClient(http2=True, timeout=30.0, limits=limits) as client:
+        # Fetch income statement, balance sheet and cash flow concurrently
+        pages = await asyncio.gather(*(_fetch_page(client, url) for url in urls))
+
+    income_data, balance_data, cashflow_data = (
+        _extract_financial_data(page.html, page.financial_data) if page and page.html else None
+        for page in pages
+    )
 
     if not income_data:
         return None
@@ -247,10 +455,42 @@ async def fetch_stock_financials(ticker: str) -> StockFinancials | None:
             financials.prev_operating_cash_flow = _safe_get(cashflow_data, "ncfo", cf_prev)
 
     # Cache the result
-    _cache[ticker] = (financials, time.time())
+    now = time.time()
+    _cache[ticker] = (financials, now)
+    _store_cached(ticker, financials, now)
     return financials
 
 
+def is_cached(ticker: str) -> bool:
+    """True if fresh financials for a ticker are cached in memory or on disk."""
+    ticker = ticker.upper().strip()
+    return _TICKER_RE.fullmatch(ticker) is not None and _get_cached(ticker) is not None
+
+
+def cache_timestamp(ticker: str) -> float | None:
+    """When the cached financials for a ticker were scraped, or None if not cached."""
+    entry = _cache.get(ticker.upper().strip())
+    return entry[1] if entry else None
+
+
+def register_cache_clear(hook: Callable[[], None]):
+    """Register a callback that clear_cache() runs to empty a derived cache."""
+    _cache_clear_hooks.append(hook)
+
+
 def clear_cache():
-    """Clear the in-memory cache."""
+    """Clear the in-memory and on-disk caches and everything derived from them.
+
+    That covers parsed pages, memoized analyses and any caches registered with
+    register_cache_clear().
+    """
     _cache.clear()
+    _parse_literal.cache_clear()
+    clear_analysis_cache()
+    for hook in _cache_clear_hooks:
+        hook()
+    for path in [*CACHE_DIR.glob(f"*{_CACHE_SUFFIX}"), *CACHE_DIR.glob(f"*{_TMP_SUFFIX}")]:
+        try:
+            path.unlink()
+        except OSError:
+            pass